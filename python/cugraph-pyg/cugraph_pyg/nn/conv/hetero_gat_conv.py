@@ -1,4 +1,4 @@
-# Copyright (c) 2023, NVIDIA CORPORATION.
+# Copyright (c) 2023-2024, NVIDIA CORPORATION.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at
@@ -11,10 +11,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+import functools
+import warnings
 from typing import Optional, Union
 from collections import defaultdict
 
 from cugraph.utilities.utils import import_optional
+from pylibcugraphops.pytorch import CSC
 from pylibcugraphops.pytorch.operators import mha_gat_n2n
 
 from .base import BaseConv
@@ -23,12 +27,42 @@ torch = import_optional("torch")
 torch_geometric = import_optional("torch_geometric")
 
 
+@functools.lru_cache(maxsize=None)
+def _side_streams(device: torch.device, num_streams: int) -> list:
+    # Shared across layers, and kept off the modules so that they stay
+    # copyable.
+    return [torch.cuda.Stream(device=device) for _ in range(num_streams)]
+
+
+def _get_autocast_dtype() -> torch.dtype:
+    # `torch.get_autocast_gpu_dtype` is deprecated as of torch 2.4.
+    major, minor = map(int, torch.__version__.split(".")[:2])
+    if (major, minor) >= (2, 4):
+        return torch.get_autocast_dtype("cuda")
+    return torch.get_autocast_gpu_dtype()
+
+
+def _narrow(
+    x_fused_dict: dict[str, torch.Tensor],
+    dim: int,
+    view: Optional[tuple[str, int, int]],
+) -> Optional[torch.Tensor]:
+    if view is None:
+        return None
+    ntype, start, stop = view
+    return x_fused_dict[ntype].narrow(dim, start, stop - start)
+
+
 class HeteroGATConv(BaseConv):
     r"""The graph attentional operator on heterogeneous graphs, where a separate
     `GATConv` is applied on the homogeneous graph for each edge type. Compared
     with directly wrapping `GATConv`s with `HeteroConv`, `HeteroGATConv` fuses
     all the linear transformation associated with each node type together into 1
     GEMM call, to improve the performance on GPUs.
+    The layer supports mixed precision through :obj:`torch.autocast`, in which
+    case the projections and attention run in the autocast dtype while the
+    outputs of all relations are aggregated, and returned, in the parameter
+    dtype.
 
     Parameters
     ----------
@@ -59,9 +93,36 @@ class HeteroGATConv(BaseConv):
 
     aggr : str, optional (default="sum")
         The aggregation scheme to use for grouping node embeddings generated by
-        different relations. Choose from "sum", "mean", "min", "max".
+        different relations. "sum", "mean", "min" and "max" are reduced on the
+        fly as relations are processed. Other schemes supported by
+        :class:`torch_geometric.nn.conv.HeteroConv`, e.g., "cat" or
+        :obj:`None`, keep the outputs of all relations before grouping them.
+
+    static_graph : bool, optional (default=False)
+        If set to :obj:`True`, the CSC representation and the cugraph-ops graph
+        of every edge type are cached and reused as long as the same
+        `edge_index` tensor and graph size are passed to :meth:`forward`. Only
+        enable it for fixed graph topologies, e.g., full-batch training or
+        inference, and do not modify `edge_index` in-place in between calls.
+        Call :meth:`reset_graph_cache` to drop the cached structures.
+
+    use_cuda_graph : bool, optional (default=False)
+        If set to :obj:`True`, which requires `static_graph`, inference forward
+        passes (evaluation mode with gradients disabled) are captured into a
+        CUDA graph on the first call and replayed on subsequent calls with the
+        same graph and input shapes, which removes the kernel launch overhead.
+
+    num_streams : int, optional (default=1)
+        Number of CUDA streams across which the attention of different edge
+        types is distributed. Values larger than 1 let the kernels of small
+        edge types run concurrently.
     """
 
+    # Version 2 stores `lin_weights` pre-transposed, and stacks the attention
+    # weights and biases of all relations. State dicts of earlier versions are
+    # converted in `_load_from_state_dict`.
+    _version = 2
+
     def __init__(
         self,
         in_channels: Union[int, dict[str, int]],
@@ -72,7 +133,10 @@ class HeteroGATConv(BaseConv):
         concat: bool = True,
         negative_slope: float = 0.2,
         bias: bool = True,
-        aggr: str = "sum",
+        aggr: Optional[str] = "sum",
+        static_graph: bool = False,
+        use_cuda_graph: bool = False,
+        num_streams: int = 1,
     ):
         major, minor, patch = torch_geometric.__version__.split(".")[:3]
         pyg_version = tuple(map(int, [major, minor, patch]))
@@ -88,17 +152,40 @@ class HeteroGATConv(BaseConv):
 
         self.node_types = node_types
         self.edge_types = edge_types
-        self.num_heads = heads
-        self.concat_heads = concat
+        # Scalar hyperparameters are kept as plain Python scalars, e.g., not as
+        # 0-d tensors or NumPy scalars, so that they are passed to cugraph-ops
+        # by value and treated as constants by `torch.compile`.
+        self.num_heads = int(heads)
+        self.concat_heads = bool(concat)
 
-        self.negative_slope = negative_slope
+        self.negative_slope = float(negative_slope)
         self.aggr = aggr
 
+        self.static_graph = static_graph
+        self._csc_cache = {}
+
+        if use_cuda_graph and not static_graph:
+            raise ValueError(
+                f"{self.__class__.__name__} requires static_graph=True "
+                f"when use_cuda_graph=True."
+            )
+        self.use_cuda_graph = use_cuda_graph
+        self.num_streams = min(num_streams, len(edge_types))
+        self._cuda_graph = None
+        self._cuda_graph_key = None
+        self._static_edge_index_dict = None
+        self._static_inputs = None
+        self._static_outputs = None
+
         self.relations_per_ntype = defaultdict(lambda: ([], []))
 
+        # Integer id of every edge type, i.e., its index into the stacked
+        # per-relation parameters.
+        self.edge_type_ids = {
+            edge_type: i for i, edge_type in enumerate(self.edge_types)
+        }
+
         lin_weights = dict.fromkeys(self.node_types)
-        attn_weights = dict.fromkeys(self.edge_types)
-        biases = dict.fromkeys(self.edge_types)
 
         ParameterDict = torch_geometric.nn.parameter_dict.ParameterDict
 
@@ -108,38 +195,61 @@ class HeteroGATConv(BaseConv):
             if src_type != dst_type:
                 self.relations_per_ntype[dst_type][1].append(edge_type)
 
-            attn_weights[edge_type] = torch.empty(
-                2 * self.num_heads * self.out_channels
-            )
-
-            if bias and concat:
-                biases[edge_type] = torch.empty(self.num_heads * out_channels)
-            elif bias:
-                biases[edge_type] = torch.empty(out_channels)
-            else:
-                biases[edge_type] = None
+        # Every relation owns a chunk of `chunk_width` channels in the fused
+        # tensor of its source (and, if bipartite, destination) node type. The
+        # (ntype, start, stop) of these chunks is computed once here, so that
+        # `split_tensors` reduces to narrowing views.
+        self._chunk_width = self.num_heads * self.out_channels
+        self._src_slice = {}
+        self._dst_slice = dict.fromkeys(self.edge_types)
 
         for ntype in self.node_types:
-            n_src_rel = len(self.relations_per_ntype[ntype][0])
-            n_dst_rel = len(self.relations_per_ntype[ntype][1])
-            n_rel = n_src_rel + n_dst_rel
-
+            src_rels, dst_rels = self.relations_per_ntype[ntype]
+            n_src_rel = len(src_rels)
+            n_rel = n_src_rel + len(dst_rels)
+
+            for i, rel in enumerate(src_rels + dst_rels):
+                start = i * self._chunk_width
+                view = (ntype, start, start + self._chunk_width)
+                if i < n_src_rel:
+                    self._src_slice[rel] = view
+                else:
+                    self._dst_slice[rel] = view
+
+            # stored pre-transposed, i.e., (in_channels, out_channels), and
+            # applied as `x @ w`
             lin_weights[ntype] = torch.empty(
-                (n_rel * self.num_heads * self.out_channels, self.in_channels[ntype])
+                (self.in_channels[ntype], n_rel * self._chunk_width)
             )
 
         self.lin_weights = ParameterDict(lin_weights)
-        self.attn_weights = ParameterDict(attn_weights)
 
-        if bias:
-            self.bias = ParameterDict(biases)
+        # Attention weights and biases of all relations are stacked into one
+        # contiguous (num_edge_types, ...) tensor each, with row
+        # `edge_type_ids[edge_type]` belonging to `edge_type`. Projection
+        # weights remain per node type, as their input sizes are ragged.
+        self.attn_weights = torch.nn.Parameter(
+            torch.empty(len(self.edge_types), 2 * self.num_heads * self.out_channels)
+        )
+
+        if bias and concat:
+            self.bias = torch.nn.Parameter(
+                torch.empty(len(self.edge_types), self.num_heads * out_channels)
+            )
+        elif bias:
+            self.bias = torch.nn.Parameter(
+                torch.empty(len(self.edge_types), out_channels)
+            )
         else:
             self.register_parameter("bias", None)
 
         self.reset_parameters()
 
     def split_tensors(
-        self, x_fused_dict: dict[str, torch.Tensor], dim: int
+        self,
+        x_fused_dict: dict[str, torch.Tensor],
+        dim: int,
+        edge_types: Optional[list[tuple[str, str, str]]] = None,
     ) -> tuple[dict[str, torch.Tensor], dict[str, torch.Tensor]]:
         """Split fused tensors into chunks based on edge types.
 
@@ -153,28 +263,32 @@ class HeteroGATConv(BaseConv):
         dim : int
             Dimension along which to split the fused tensor.
 
+        edge_types : List[Tuple[str, str, str]], optional (default=None)
+            If given, only the chunks of these edge types are extracted.
+
         Returns
         -------
         x_src_dict : dict[str, torch.Tensor]
             A dictionary to hold source node feature for each relation graph.
 
         x_dst_dict : dict[str, torch.Tensor]
-            A dictionary to hold destination node feature for each relation graph.
+            A dictionary to hold destination node feature for each relation
+            graph. The value is :obj:`None` for relations between the same
+            node type.
         """
-        x_src_dict = dict.fromkeys(self.edge_types)
-        x_dst_dict = dict.fromkeys(self.edge_types)
+        if edge_types is None:
+            edge_types = self.edge_types
 
-        for ntype, t in x_fused_dict.items():
-            n_src_rel = len(self.relations_per_ntype[ntype][0])
-            n_dst_rel = len(self.relations_per_ntype[ntype][1])
-            n_rel = n_src_rel + n_dst_rel
-            t_list = torch.chunk(t, chunks=n_rel, dim=dim)
+        src_slice, dst_slice = self._src_slice, self._dst_slice
 
-            for i, src_rel in enumerate(self.relations_per_ntype[ntype][0]):
-                x_src_dict[src_rel] = t_list[i]
-
-            for i, dst_rel in enumerate(self.relations_per_ntype[ntype][1]):
-                x_dst_dict[dst_rel] = t_list[i + n_src_rel]
+        x_src_dict = {
+            edge_type: _narrow(x_fused_dict, dim, src_slice[edge_type])
+            for edge_type in edge_types
+        }
+        x_dst_dict = {
+            edge_type: _narrow(x_fused_dict, dim, dst_slice[edge_type])
+            for edge_type in edge_types
+        }
 
         return x_src_dict, x_dst_dict
 
@@ -182,7 +296,7 @@ class HeteroGATConv(BaseConv):
         if seed is not None:
             torch.manual_seed(seed)
 
-        w_src, w_dst = self.split_tensors(self.lin_weights, dim=0)
+        w_src, w_dst = self.split_tensors(self.lin_weights, dim=1)
 
         for edge_type in self.edge_types:
             src_type, _, dst_type = edge_type
@@ -196,70 +310,498 @@ class HeteroGATConv(BaseConv):
 
             # attn_weights
             torch_geometric.nn.inits.glorot(
-                self.attn_weights[edge_type].view(-1, self.num_heads, self.out_channels)
+                self.attn_weights[self.edge_type_ids[edge_type]].view(
+                    -1, self.num_heads, self.out_channels
+                )
             )
 
-            # bias
-            if self.bias is not None:
-                torch_geometric.nn.inits.zeros(self.bias[edge_type])
+        # bias
+        torch_geometric.nn.inits.zeros(self.bias)
 
-    def forward(
+    def _project(
         self,
         x_dict: dict[str, torch.Tensor],
-        edge_index_dict: dict[tuple[str, str, str], torch.Tensor],
-    ) -> dict[str, torch.Tensor]:
-        feat_dict = dict.fromkeys(x_dict.keys())
+        edge_types: list[tuple[str, str, str]],
+    ) -> tuple[dict[str, torch.Tensor], dict[str, torch.Tensor]]:
+        """Apply the linear transformation of the given relations. Projections
+        of relations that are absent from `edge_types` are skipped.
+
+        The projected features are materialized on purpose: besides the
+        attention logits, `mha_gat_n2n` aggregates them as messages, so folding
+        the attention vectors into the projection weights would not remove
+        this intermediate.
+
+        Parameters
+        ----------
+        x_dict : dict[str, torch.Tensor]
+            A dictionary to hold input node feature for each node type.
+
+        edge_types : List[Tuple[str, str, str]]
+            Edge types present in the current graph.
 
+        Returns
+        -------
+        x_src_dict : dict[str, torch.Tensor]
+            A dictionary to hold source node feature for each relation graph.
+
+        x_dst_dict : dict[str, torch.Tensor]
+            A dictionary to hold destination node feature for each relation graph.
+        """
+        # One fused GEMM per node type, split into per-relation views. The
+        # destination block of the fused weight, i.e., the trailing columns, is
+        # only computed when a bipartite relation into `ntype` is present.
+        active = set(edge_types)
+        r2n = self.relations_per_ntype
+        feat_dict = {}
         for ntype, x in x_dict.items():
-            feat_dict[ntype] = x @ self.lin_weights[ntype].T
+            src_rels, dst_rels = r2n[ntype]
+            w = self.lin_weights[ntype]
+            if any(rel in active for rel in dst_rels):
+                feat_dict[ntype] = x @ w
+            elif any(rel in active for rel in src_rels):
+                feat_dict[ntype] = x @ w[:, : len(src_rels) * self._chunk_width]
+        return self.split_tensors(feat_dict, dim=1, edge_types=edge_types)
+
+    def reset_graph_cache(self):
+        """Drop the cached graph structures used when `static_graph=True`,
+        including the captured CUDA graph, if any."""
+        self._csc_cache.clear()
+        self._cuda_graph = None
+        self._cuda_graph_key = None
+        self._static_edge_index_dict = None
+        self._static_inputs = None
+        self._static_outputs = None
+
+    def _apply(self, *args, **kwargs):
+        # Cached structures refer to the previous device and parameter storage.
+        self.reset_graph_cache()
+        return super()._apply(*args, **kwargs)
+
+    def _load_from_state_dict(
+        self,
+        state_dict,
+        prefix,
+        local_metadata,
+        strict,
+        missing_keys,
+        unexpected_keys,
+        error_msgs,
+    ):
+        # Loading may assign new parameters, e.g., with `assign=True`, which
+        # the captured CUDA graph does not read from.
+        self.reset_graph_cache()
 
-        x_src_dict, x_dst_dict = self.split_tensors(feat_dict, dim=1)
+        version = local_metadata.get("version", None)
+        to_internal_key = self.lin_weights.to_internal_key
 
-        out_dict = defaultdict(list)
+        for ntype in self.node_types:
+            key = f"{prefix}lin_weights.{to_internal_key(ntype)}"
+            weight = state_dict.get(key)
+            if weight is None or weight.dim() != 2:
+                continue
+
+            shape = self.lin_weights[ntype].shape
+            if version is None and weight.shape == shape == shape[::-1]:
+                # Without metadata, the layout of a square weight is unknown.
+                warnings.warn(
+                    f"Cannot infer the layout of '{key}' from its square shape "
+                    f"{tuple(weight.shape)}, since the state dict carries no "
+                    f"version metadata. It is loaded as (in_channels, "
+                    f"out_channels); transpose it beforehand if it was saved "
+                    f"in the (out_channels, in_channels) layout of earlier "
+                    f"versions of {self.__class__.__name__}."
+                )
+            elif (version is not None and version < 2) or (
+                version is None and weight.shape == shape[::-1]
+            ):
+                # Legacy layout, i.e., (out_channels, in_channels).
+                state_dict[key] = weight.t()
+
+        # Earlier versions held one attention weight and bias per edge type in
+        # a `ParameterDict`; stack them in the order of `edge_type_ids`.
+        for name in ("attn_weights", "bias"):
+            keys = [
+                f"{prefix}{name}.{to_internal_key(edge_type)}"
+                for edge_type in self.edge_type_ids
+            ]
+            if f"{prefix}{name}" not in state_dict and all(
+                key in state_dict for key in keys
+            ):
+                state_dict[f"{prefix}{name}"] = torch.stack(
+                    [state_dict.pop(key) for key in keys]
+                )
+
+        super()._load_from_state_dict(
+            state_dict,
+            prefix,
+            local_metadata,
+            strict,
+            missing_keys,
+            unexpected_keys,
+            error_msgs,
+        )
+
+    @staticmethod
+    def _batched_to_csc(
+        edge_index_dict: dict[tuple[str, str, str], torch.Tensor],
+        size_dict: dict[tuple[str, str, str], tuple[int, int]],
+    ) -> dict[tuple[str, str, str], tuple[torch.Tensor, torch.Tensor, int]]:
+        # Destination indices of every edge type are shifted into a disjoint
+        # range, so that a single sort and a single `index2ptr` produce the CSC
+        # of all edge types at once. The CSC of one edge type is then a slice
+        # of the global one, with offsets known on the host.
+        if len(edge_index_dict) == 1:
+            edge_type, edge_index = next(iter(edge_index_dict.items()))
+            return {edge_type: BaseConv.to_csc(edge_index, size_dict[edge_type])}
+
+        rows, cols, dst_offsets = [], [], []
+        num_dst_total = 0
+        for edge_type, edge_index in edge_index_dict.items():
+            rows.append(edge_index[0])
+            cols.append(edge_index[1] + num_dst_total)
+            dst_offsets.append(num_dst_total)
+            num_dst_total += size_dict[edge_type][1]
+
+        col, perm = torch_geometric.utils.index_sort(
+            torch.cat(cols), max_value=num_dst_total
+        )
+        row = torch.cat(rows)[perm]
+        colptr = torch_geometric.utils.sparse.index2ptr(col, num_dst_total)
+
+        csc_dict = {}
+        edge_offset = 0
+        for (edge_type, edge_index), dst_offset in zip(
+            edge_index_dict.items(), dst_offsets
+        ):
+            num_src_nodes, num_dst_nodes = size_dict[edge_type]
+            num_edges = edge_index.size(1)
+            csc_dict[edge_type] = (
+                row[edge_offset : edge_offset + num_edges],
+                colptr[dst_offset : dst_offset + num_dst_nodes + 1] - edge_offset,
+                num_src_nodes,
+            )
+            edge_offset += num_edges
+
+        return csc_dict
+
+    def _get_graphs(
+        self,
+        x_dict: dict[str, torch.Tensor],
+        edge_index_dict: dict[tuple[str, str, str], torch.Tensor],
+        max_num_neighbors: Optional[dict[tuple[str, str, str], int]] = None,
+    ) -> dict[tuple[str, str, str], tuple[tuple[torch.Tensor, torch.Tensor, int], CSC]]:
+        # Returns the CSC representation along with the cugraph-ops graph of
+        # every edge type, as the graph does not own the CSC tensors.
+        graphs = {}
+        keys = {}
+        missing = {}
 
         for edge_type, edge_index in edge_index_dict.items():
             src_type, _, dst_type = edge_type
+            size = (x_dict[src_type].size(0), x_dict[dst_type].size(0))
+            key = keys[edge_type] = (
+                size,
+                max_num_neighbors.get(edge_type) if max_num_neighbors else None,
+            )
+
+            if self.static_graph:
+                cached = self._csc_cache.get(edge_type)
+                # `edge_index` is kept alive by the cache, hence identity is safe.
+                if cached is not None and cached[0] is edge_index and cached[1] == key:
+                    graphs[edge_type] = cached[2:]
+                    continue
 
-            csc = BaseConv.to_csc(
-                edge_index, (x_dict[src_type].size(0), x_dict[dst_type].size(0))
+            missing[edge_type] = edge_index
+
+        if not missing:
+            return graphs
+
+        csc_dict = self._batched_to_csc(
+            missing, {edge_type: keys[edge_type][0] for edge_type in missing}
+        )
+
+        for edge_type, csc in csc_dict.items():
+            graph = self.get_cugraph(
+                csc,
+                bipartite=edge_type[0] != edge_type[2],
+                max_num_neighbors=keys[edge_type][1],
             )
+            graphs[edge_type] = (csc, graph)
 
-            if src_type == dst_type:
-                graph = self.get_cugraph(
+            if self.static_graph:
+                self._csc_cache[edge_type] = (
+                    missing[edge_type],
+                    keys[edge_type],
                     csc,
-                    bipartite=False,
-                )
-                out = mha_gat_n2n(
-                    x_src_dict[edge_type],
-                    self.attn_weights[edge_type],
                     graph,
-                    num_heads=self.num_heads,
-                    activation="LeakyReLU",
-                    negative_slope=self.negative_slope,
-                    concat_heads=self.concat_heads,
                 )
 
-            else:
-                graph = self.get_cugraph(
-                    csc,
-                    bipartite=True,
-                )
-                out = mha_gat_n2n(
-                    (x_src_dict[edge_type], x_dst_dict[edge_type]),
-                    self.attn_weights[edge_type],
-                    graph,
-                    num_heads=self.num_heads,
-                    activation="LeakyReLU",
-                    negative_slope=self.negative_slope,
-                    concat_heads=self.concat_heads,
+        return graphs
+
+    def _forward_edge(
+        self,
+        x_src: torch.Tensor,
+        x_dst: Optional[torch.Tensor],
+        attn: torch.Tensor,
+        graph: CSC,
+    ) -> torch.Tensor:
+        # `x_dst` is None for relations between the same node type, where the
+        # graph is not bipartite. With `concat_heads=False`, the heads are
+        # averaged inside the kernel before the output is written. In reduced
+        # precision, gradients are kept in fp32 inside cugraph-ops for as long
+        # as possible.
+        high_precision = x_src.dtype != torch.float32
+
+        # The layer is not compiled with `torch.compile(fullgraph=True)`:
+        # `mha_gat_n2n` takes an opaque cugraph-ops graph object, and exposing
+        # it as a custom op with a backward needs `torch.library.custom_op`,
+        # i.e., torch >= 2.4, whereas torch >= 2.0 is supported.
+        return mha_gat_n2n(
+            (x_src, x_dst) if x_dst is not None else x_src,
+            attn.to(x_src.dtype),
+            graph,
+            num_heads=self.num_heads,
+            activation="LeakyReLU",
+            negative_slope=self.negative_slope,
+            concat_heads=self.concat_heads,
+            high_precision_dgrad=high_precision,
+            high_precision_wgrad=high_precision,
+        )
+
+    def _forward_cuda_graph(
+        self,
+        x_dict: dict[str, torch.Tensor],
+        edge_index_dict: dict[tuple[str, str, str], torch.Tensor],
+        max_num_neighbors: Optional[dict[tuple[str, str, str], int]],
+    ) -> dict[str, torch.Tensor]:
+        # `_static_edge_index_dict` keeps the captured `edge_index` tensors
+        # alive, hence their ids cannot be reused by other tensors. The
+        # autocast state determines the dtypes of the captured kernels.
+        autocast = torch.is_autocast_enabled()
+        key = (
+            tuple((k, x.shape, x.dtype, x.device) for k, x in x_dict.items()),
+            tuple((k, id(v)) for k, v in edge_index_dict.items()),
+            tuple(max_num_neighbors.items()) if max_num_neighbors else None,
+            _get_autocast_dtype() if autocast else None,
+        )
+
+        if self._cuda_graph is not None and self._cuda_graph_key == key:
+            for ntype, x in x_dict.items():
+                self._static_inputs[ntype].copy_(x)
+        else:
+            self.reset_graph_cache()
+            static_inputs = {k: x.clone() for k, x in x_dict.items()}
+
+            # Autocast caches the casts of parameters until the caller's
+            # autocast region exits, after which their memory is released.
+            # Disable the cache, so that the casts are part of the graph
+            # rather than reads of cached tensors.
+            autocast_ctx = (
+                torch.autocast("cuda", dtype=key[-1], cache_enabled=False)
+                if autocast
+                else contextlib.nullcontext()
+            )
+
+            # Warm up on a side stream; this also populates the CSC cache so
+            # that no host-side graph construction happens during capture.
+            stream = torch.cuda.Stream()
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream), autocast_ctx:
+                for _ in range(3):
+                    self._forward(static_inputs, edge_index_dict, max_num_neighbors)
+            torch.cuda.current_stream().wait_stream(stream)
+
+            cuda_graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(cuda_graph), autocast_ctx:
+                static_outputs = self._forward(
+                    static_inputs, edge_index_dict, max_num_neighbors
                 )
 
-            if self.bias is not None:
-                out = out + self.bias[edge_type]
+            self._cuda_graph = cuda_graph
+            self._cuda_graph_key = key
+            self._static_edge_index_dict = dict(edge_index_dict)
+            self._static_inputs = static_inputs
+            self._static_outputs = static_outputs
+
+        self._cuda_graph.replay()
+
+        # The static outputs are overwritten by the next replay.
+        return {k: v.clone() for k, v in self._static_outputs.items()}
 
-            out_dict[dst_type].append(out)
+    def forward(
+        self,
+        x_dict: dict[str, torch.Tensor],
+        edge_index_dict: dict[tuple[str, str, str], torch.Tensor],
+        max_num_neighbors: Optional[Union[int, dict[tuple[str, str, str], int]]] = None,
+    ) -> dict[str, torch.Tensor]:
+        """Runs the forward pass of the module.
+
+        Parameters
+        ----------
+        x_dict : dict[str, torch.Tensor]
+            A dictionary to hold input node feature for each node type.
+
+        edge_index_dict : dict[tuple[str, str, str], torch.Tensor]
+            A dictionary to hold the edge indices of each edge type.
+
+        max_num_neighbors : int or dict[tuple[str, str, str], int], optional
+            The maximum number of neighbors of a destination node, either for
+            all edge types or per edge type, e.g., the fanout of a neighbor
+            sampler. When enabled, it allows the layer to use the
+            message-flow-graph primitives in cugraph-ops. (default=None)
+
+        Returns
+        -------
+        out_dict : dict[str, torch.Tensor]
+            A dictionary to hold the output feature for each destination
+            node type.
+        """
+        if isinstance(max_num_neighbors, int):
+            max_num_neighbors = dict.fromkeys(edge_index_dict, max_num_neighbors)
+
+        if (
+            self.use_cuda_graph
+            and self.static_graph
+            and not self.training
+            and not torch.is_grad_enabled()
+            and all(x.is_cuda for x in x_dict.values())
+        ):
+            return self._forward_cuda_graph(x_dict, edge_index_dict, max_num_neighbors)
+
+        return self._forward(x_dict, edge_index_dict, max_num_neighbors)
+
+    def _forward(
+        self,
+        x_dict: dict[str, torch.Tensor],
+        edge_index_dict: dict[tuple[str, str, str], torch.Tensor],
+        max_num_neighbors: Optional[dict[tuple[str, str, str], int]] = None,
+    ) -> dict[str, torch.Tensor]:
+        x_src_dict, x_dst_dict = self._project(x_dict, list(edge_index_dict.keys()))
+        graphs = self._get_graphs(x_dict, edge_index_dict, max_num_neighbors)
+
+        # Outputs of every relation are reduced on the fly into one accumulator
+        # per destination type (and stream), so that only a single
+        # (N_dst, H * F') tensor per destination type is live at a time. For
+        # "sum" and "mean", the reduced bias, which commutes with the
+        # aggregation, is added once when an accumulator is created.
+        online = self.aggr in ("sum", "mean", "max", "min")
+        online_sum = self.aggr in ("sum", "mean")
+
+        # Bind parameters to locals, avoiding `nn.Module.__getattr__` per relation.
+        attn_w = self.attn_weights
+        bias_w = self.bias
+        edge_type_ids = self.edge_type_ids
+
+        rels_per_dst = {}
+        for edge_type in edge_index_dict.keys():
+            rels_per_dst.setdefault(edge_type[2], []).append(edge_type)
+
+        bias_pending = set()
+        if online_sum and bias_w is not None:
+            bias_pending.update(rels_per_dst.keys())
+
+        # Relations are independent of each other, hence they are distributed
+        # round-robin across side streams, each with its own accumulators.
+        streams = None
+        if self.num_streams > 1 and len(edge_index_dict) > 1:
+            device = attn_w.device
+            if device.type == "cuda":
+                streams = _side_streams(device, self.num_streams)
+                main_stream = torch.cuda.current_stream(device)
+                for stream in streams:
+                    stream.wait_stream(main_stream)
+
+        out_dicts = [{} for _ in range(len(streams) if streams else 1)]
+        # Other aggregations, e.g., "cat", are applied to the outputs of all
+        # relations at the end, in the order of `edge_index_dict`.
+        out_lists = {}
+
+        for i, edge_type in enumerate(edge_index_dict.keys()):
+            src_type, _, dst_type = edge_type
+            out_dict = out_dicts[i % len(out_dicts)]
+
+            x_src = x_src_dict[edge_type]
+            x_dst = x_dst_dict[edge_type] if src_type != dst_type else None
+            (row, colptr, _), graph = graphs[edge_type]
+
+            stream_ctx = contextlib.nullcontext()
+            if streams:
+                stream = streams[i % len(streams)]
+                stream_ctx = torch.cuda.stream(stream)
+                # The inputs are allocated on the main stream. Their memory
+                # must not be reused before the side stream, including the
+                # backward pass of the relation, is done reading them.
+                for t in (x_src, x_dst, row, colptr):
+                    if t is not None:
+                        t.record_stream(stream)
+
+            with stream_ctx:
+                out = self._forward_edge(
+                    x_src,
+                    x_dst,
+                    attn_w[edge_type_ids[edge_type]],
+                    graph,
+                )
 
-        for key, value in out_dict.items():
-            out_dict[key] = torch_geometric.nn.conv.hetero_conv.group(value, self.aggr)
+                acc = out_dict.get(dst_type)
+
+                if online_sum:
+                    if acc is not None:
+                        acc.add_(out)
+                    elif dst_type in bias_pending:
+                        bias_pending.remove(dst_type)
+                        out_dict[dst_type] = out + sum(
+                            bias_w[edge_type_ids[rel]] for rel in rels_per_dst[dst_type]
+                        )
+                    else:
+                        # A fresh copy, accumulated into in-place afterwards.
+                        out_dict[dst_type] = out.to(dtype=attn_w.dtype, copy=True)
+                    continue
+
+                out = out.to(attn_w.dtype)
+                if bias_w is not None:
+                    out = out + bias_w[edge_type_ids[edge_type]]
+
+                if not online:
+                    out_lists.setdefault(dst_type, []).append(out)
+                elif acc is None:
+                    out_dict[dst_type] = out
+                elif self.aggr == "max":
+                    out_dict[dst_type] = torch.maximum(acc, out)
+                else:
+                    out_dict[dst_type] = torch.minimum(acc, out)
+
+        if streams:
+            for stream in streams:
+                main_stream.wait_stream(stream)
+            for partial_dict in out_dicts:
+                for acc in partial_dict.values():
+                    acc.record_stream(main_stream)
+            for outs in out_lists.values():
+                for out in outs:
+                    out.record_stream(main_stream)
+
+        if not online:
+            group = torch_geometric.nn.conv.hetero_conv.group
+            return {
+                dst_type: group(outs, self.aggr) for dst_type, outs in out_lists.items()
+            }
+
+        out_dict = out_dicts[0]
+        for partial_dict in out_dicts[1:]:
+            for dst_type, partial in partial_dict.items():
+                acc = out_dict.get(dst_type)
+                if acc is None:
+                    out_dict[dst_type] = partial
+                elif online_sum:
+                    acc.add_(partial)
+                elif self.aggr == "max":
+                    out_dict[dst_type] = torch.maximum(acc, partial)
+                else:
+                    out_dict[dst_type] = torch.minimum(acc, partial)
+
+        if self.aggr == "mean":
+            for dst_type, acc in out_dict.items():
+                acc.div_(len(rels_per_dst[dst_type]))
 
         return out_dict
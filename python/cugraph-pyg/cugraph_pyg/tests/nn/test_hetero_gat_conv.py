@@ -1,4 +1,4 @@
-# Copyright (c) 2023, NVIDIA CORPORATION.
+# Copyright (c) 2023-2024, NVIDIA CORPORATION.
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
 # You may obtain a copy of the License at
@@ -22,19 +22,11 @@ torch_geometric = import_optional("torch_geometric")
 ATOL = 1e-6
 
 
-@pytest.mark.cugraph_ops
-@pytest.mark.skipif(isinstance(torch, MissingModule), reason="torch not available")
-@pytest.mark.skipif(
-    isinstance(torch_geometric, MissingModule), reason="torch_geometric not available"
-)
-@pytest.mark.parametrize("heads", [1, 3, 10])
-@pytest.mark.parametrize("aggr", ["sum", "mean"])
-def test_hetero_gat_conv_equality(sample_pyg_hetero_data, aggr, heads):
-    major, minor, patch = torch_geometric.__version__.split(".")[:3]
-    pyg_version = tuple(map(int, [major, minor, patch]))
-    if pyg_version < (2, 4, 0):
-        pytest.skip("Skipping HeteroGATConv test")
-
+def check_equality(
+    sample_pyg_hetero_data, heads, aggr, concat, bias, edge_types=None, **kwargs
+):
+    # Compares HeteroGATConv (with `kwargs`) against HeteroConv of GATConvs.
+    # If given, only the edges of `edge_types` are passed to both layers.
     from torch_geometric.data import HeteroData
     from torch_geometric.nn import HeteroConv, GATConv
 
@@ -45,7 +37,7 @@ def test_hetero_gat_conv_equality(sample_pyg_hetero_data, aggr, heads):
     out_channels = 2
 
     convs_dict = {}
-    kwargs1 = dict(heads=heads, add_self_loops=False, bias=False)
+    kwargs1 = dict(heads=heads, add_self_loops=False, bias=bias, concat=concat)
     for edge_type in data.edge_types:
         src_t, _, dst_t = edge_type
         in_channels_src, in_channels_dst = data.x_dict[src_t].size(-1), data.x_dict[
@@ -64,69 +56,498 @@ def test_hetero_gat_conv_equality(sample_pyg_hetero_data, aggr, heads):
         aggr=aggr,
         node_types=data.node_types,
         edge_types=data.edge_types,
-        bias=False,
+        bias=bias,
+        concat=concat,
+        **kwargs,
     )
     conv2 = CuGraphHeteroGATConv(in_channels_dict, out_channels, **kwargs2).to(device)
 
-    # copy over linear and attention weights
-    w_src, w_dst = conv2.split_tensors(conv2.lin_weights, dim=0)
+    # copy over linear and attention weights, and biases, which are
+    # randomized, as GATConv initializes them to zeros
+    w_src, w_dst = conv2.split_tensors(conv2.lin_weights, dim=1)
     with torch.no_grad():
         for edge_type in conv2.edge_types:
             src_t, _, dst_t = edge_type
-            w_src[edge_type][:, :] = conv1.convs[edge_type].lin_src.weight[:, :]
+            w_src[edge_type][:, :] = conv1.convs[edge_type].lin_src.weight.T
             if w_dst[edge_type] is not None:
-                w_dst[edge_type][:, :] = conv1.convs[edge_type].lin_dst.weight[:, :]
+                w_dst[edge_type][:, :] = conv1.convs[edge_type].lin_dst.weight.T
 
-            conv2.attn_weights[edge_type][: heads * out_channels] = conv1.convs[
+            idx = conv2.edge_type_ids[edge_type]
+            conv2.attn_weights[idx, : heads * out_channels] = conv1.convs[
                 edge_type
             ].att_src.data.flatten()
-            conv2.attn_weights[edge_type][heads * out_channels :] = conv1.convs[
+            conv2.attn_weights[idx, heads * out_channels :] = conv1.convs[
                 edge_type
             ].att_dst.data.flatten()
 
-    out1 = conv1(data.x_dict, data.edge_index_dict)
-    out2 = conv2(data.x_dict, data.edge_index_dict)
+            if bias:
+                conv1.convs[edge_type].bias.normal_()
+                conv2.bias[idx] = conv1.convs[edge_type].bias
+
+    edge_index_dict = data.edge_index_dict
+    if edge_types is not None:
+        edge_index_dict = {k: edge_index_dict[k] for k in edge_types}
 
-    for node_type in data.node_types:
+    out1 = conv1(data.x_dict, edge_index_dict)
+    out2 = conv2(data.x_dict, edge_index_dict)
+
+    assert out1.keys() == out2.keys()
+    for node_type in out1:
         assert torch.allclose(out1[node_type], out2[node_type], atol=ATOL)
 
     loss1 = 0
     loss2 = 0
-    for node_type in data.node_types:
+    for node_type in out1:
         loss1 += out1[node_type].mean()
         loss2 += out2[node_type].mean()
 
     loss1.backward()
     loss2.backward()
 
+    # parameters of absent relations (or node types) receive no gradient
+    def grad(param):
+        return param.grad if param.grad is not None else torch.zeros_like(param)
+
     # check gradient w.r.t attention weights
     out_dim = heads * out_channels
     for edge_type in conv2.edge_types:
+        idx = conv2.edge_type_ids[edge_type]
         assert torch.allclose(
-            conv1.convs[edge_type].att_src.grad.flatten(),
-            conv2.attn_weights[edge_type].grad[:out_dim],
+            grad(conv1.convs[edge_type].att_src).flatten(),
+            conv2.attn_weights.grad[idx, :out_dim],
             atol=ATOL,
         )
         assert torch.allclose(
-            conv1.convs[edge_type].att_dst.grad.flatten(),
-            conv2.attn_weights[edge_type].grad[out_dim:],
+            grad(conv1.convs[edge_type].att_dst).flatten(),
+            conv2.attn_weights.grad[idx, out_dim:],
             atol=ATOL,
         )
 
+    # check gradient w.r.t biases
+    if bias:
+        for edge_type in conv2.edge_types:
+            assert torch.allclose(
+                grad(conv1.convs[edge_type].bias),
+                conv2.bias.grad[conv2.edge_type_ids[edge_type]],
+                atol=ATOL,
+            )
+
     # check gradient w.r.t linear weights
     grad_lin_weights_ref = dict.fromkeys(out1.keys())
     for node_t, (rels_as_src, rels_as_dst) in conv2.relations_per_ntype.items():
         grad_list = []
         for rel_t in rels_as_src:
-            grad_list.append(conv1.convs[rel_t].lin_src.weight.grad.clone())
+            grad_list.append(grad(conv1.convs[rel_t].lin_src.weight).clone())
         for rel_t in rels_as_dst:
-            grad_list.append(conv1.convs[rel_t].lin_dst.weight.grad.clone())
+            grad_list.append(grad(conv1.convs[rel_t].lin_dst.weight).clone())
         assert len(grad_list) > 0
-        grad_lin_weights_ref[node_t] = torch.vstack(grad_list)
+        grad_lin_weights_ref[node_t] = torch.vstack(grad_list).T
 
     for node_type in conv2.lin_weights:
         assert torch.allclose(
             grad_lin_weights_ref[node_type],
-            conv2.lin_weights[node_type].grad,
+            grad(conv2.lin_weights[node_type]),
             atol=ATOL,
         )
+
+
+@pytest.mark.cugraph_ops
+@pytest.mark.skipif(isinstance(torch, MissingModule), reason="torch not available")
+@pytest.mark.skipif(
+    isinstance(torch_geometric, MissingModule), reason="torch_geometric not available"
+)
+@pytest.mark.parametrize("heads", [1, 3, 10])
+@pytest.mark.parametrize("aggr", ["sum", "mean", "max", "min", "cat", "prod", None])
+@pytest.mark.parametrize("concat", [True, False])
+@pytest.mark.parametrize("bias", [True, False])
+def test_hetero_gat_conv_equality(sample_pyg_hetero_data, aggr, heads, concat, bias):
+    major, minor, patch = torch_geometric.__version__.split(".")[:3]
+    pyg_version = tuple(map(int, [major, minor, patch]))
+    if pyg_version < (2, 4, 0):
+        pytest.skip("Skipping HeteroGATConv test")
+
+    check_equality(sample_pyg_hetero_data, heads, aggr, concat, bias)
+
+
+@pytest.mark.cugraph_ops
+@pytest.mark.skipif(isinstance(torch, MissingModule), reason="torch not available")
+@pytest.mark.skipif(
+    isinstance(torch_geometric, MissingModule), reason="torch_geometric not available"
+)
+@pytest.mark.parametrize("aggr", ["sum", "mean", "max", "min", "cat"])
+def test_hetero_gat_conv_num_streams(sample_pyg_hetero_data, aggr):
+    major, minor, patch = torch_geometric.__version__.split(".")[:3]
+    pyg_version = tuple(map(int, [major, minor, patch]))
+    if pyg_version < (2, 4, 0):
+        pytest.skip("Skipping HeteroGATConv test")
+
+    # relations are split across the side streams, each with partial outputs
+    check_equality(sample_pyg_hetero_data, 3, aggr, True, True, num_streams=2)
+
+
+@pytest.mark.cugraph_ops
+@pytest.mark.skipif(isinstance(torch, MissingModule), reason="torch not available")
+@pytest.mark.skipif(
+    isinstance(torch_geometric, MissingModule), reason="torch_geometric not available"
+)
+@pytest.mark.parametrize(
+    "edge_types",
+    [
+        # v0 has no relation, v1 only relations as source, v2 only as destination
+        [("v1", "e1", "v1"), ("v1", "e3", "v2")],
+        # v0 only has a same-type relation, v2 only relations as source
+        [("v2", "e0", "v1"), ("v0", "e2", "v0")],
+        [("v0", "e4", "v2")],
+    ],
+)
+@pytest.mark.parametrize("aggr", ["sum", "max"])
+def test_hetero_gat_conv_edge_type_subset(sample_pyg_hetero_data, edge_types, aggr):
+    major, minor, patch = torch_geometric.__version__.split(".")[:3]
+    pyg_version = tuple(map(int, [major, minor, patch]))
+    if pyg_version < (2, 4, 0):
+        pytest.skip("Skipping HeteroGATConv test")
+
+    check_equality(sample_pyg_hetero_data, 3, aggr, True, True, edge_types=edge_types)
+
+
+@pytest.mark.skipif(isinstance(torch, MissingModule), reason="torch not available")
+@pytest.mark.skipif(
+    isinstance(torch_geometric, MissingModule), reason="torch_geometric not available"
+)
+def test_hetero_gat_conv_load_legacy_state_dict():
+    major, minor, patch = torch_geometric.__version__.split(".")[:3]
+    pyg_version = tuple(map(int, [major, minor, patch]))
+    if pyg_version < (2, 4, 0):
+        pytest.skip("Skipping HeteroGATConv test")
+
+    node_types = ["v0", "v1"]
+    edge_types = [("v0", "e0", "v0"), ("v0", "e1", "v1"), ("v1", "e2", "v0")]
+    # Every projection weight is square, i.e., its layout cannot be inferred
+    # from the shape alone.
+    in_channels_dict = {"v0": 6, "v1": 4}
+    kwargs = dict(node_types=node_types, edge_types=edge_types, heads=1)
+    conv1 = CuGraphHeteroGATConv(in_channels_dict, 2, **kwargs)
+    conv2 = CuGraphHeteroGATConv(in_channels_dict, 2, **kwargs)
+
+    # version 1 stored the projection weights as (out_channels, in_channels),
+    # and the attention weights and biases in a `ParameterDict` per edge type
+    with torch.no_grad():
+        conv1.bias.normal_()
+    state_dict = conv1.state_dict()
+    for node_type in node_types:
+        key = f"lin_weights.{node_type}"
+        state_dict[key] = state_dict[key].t().contiguous()
+    to_internal_key = torch_geometric.nn.parameter_dict.ParameterDict.to_internal_key
+    for name in ("attn_weights", "bias"):
+        stacked = state_dict.pop(name)
+        for edge_type, idx in conv1.edge_type_ids.items():
+            state_dict[f"{name}.{to_internal_key(edge_type)}"] = stacked[idx].clone()
+    state_dict._metadata[""]["version"] = 1
+
+    conv2.load_state_dict(state_dict)
+    for node_type in node_types:
+        assert torch.equal(conv1.lin_weights[node_type], conv2.lin_weights[node_type])
+    assert torch.equal(conv1.attn_weights, conv2.attn_weights)
+    assert torch.equal(conv1.bias, conv2.bias)
+
+    # without metadata, square weights are loaded as-is with a warning
+    with pytest.warns(UserWarning, match="Cannot infer the layout"):
+        conv2.load_state_dict(dict(conv1.state_dict()))
+    for node_type in node_types:
+        assert torch.equal(conv1.lin_weights[node_type], conv2.lin_weights[node_type])
+
+
+@pytest.mark.cugraph_ops
+@pytest.mark.skipif(isinstance(torch, MissingModule), reason="torch not available")
+@pytest.mark.skipif(
+    isinstance(torch_geometric, MissingModule), reason="torch_geometric not available"
+)
+@pytest.mark.parametrize("aggr", ["sum", "max", "cat"])
+@pytest.mark.parametrize("bias", [True, False])
+def test_hetero_gat_conv_autocast(sample_pyg_hetero_data, aggr, bias):
+    major, minor, patch = torch_geometric.__version__.split(".")[:3]
+    pyg_version = tuple(map(int, [major, minor, patch]))
+    if pyg_version < (2, 4, 0):
+        pytest.skip("Skipping HeteroGATConv test")
+
+    from torch_geometric.data import HeteroData
+
+    device = torch.device("cuda:0")
+    data = HeteroData(sample_pyg_hetero_data).to(device)
+
+    in_channels_dict = {k: v.size(1) for k, v in data.x_dict.items()}
+    conv = CuGraphHeteroGATConv(
+        in_channels_dict,
+        2,
+        node_types=data.node_types,
+        edge_types=data.edge_types,
+        heads=3,
+        aggr=aggr,
+        bias=bias,
+    ).to(device)
+
+    out_ref = conv(data.x_dict, data.edge_index_dict)
+    with torch.autocast(device.type, dtype=torch.float16):
+        out = conv(data.x_dict, data.edge_index_dict)
+
+    # outputs are returned in the parameter dtype regardless of `aggr`
+    for node_type in out_ref:
+        assert out[node_type].dtype == torch.float32
+        assert torch.allclose(out[node_type], out_ref[node_type], atol=1e-2, rtol=1e-2)
+
+    loss = sum(out[node_type].mean() for node_type in out)
+    loss.backward()
+
+    assert conv.attn_weights.grad.dtype == torch.float32
+    for node_type in conv.lin_weights:
+        assert conv.lin_weights[node_type].grad.dtype == torch.float32
+
+
+@pytest.mark.cugraph_ops
+@pytest.mark.skipif(isinstance(torch, MissingModule), reason="torch not available")
+@pytest.mark.skipif(
+    isinstance(torch_geometric, MissingModule), reason="torch_geometric not available"
+)
+def test_hetero_gat_conv_cuda_graph(sample_pyg_hetero_data):
+    major, minor, patch = torch_geometric.__version__.split(".")[:3]
+    pyg_version = tuple(map(int, [major, minor, patch]))
+    if pyg_version < (2, 4, 0):
+        pytest.skip("Skipping HeteroGATConv test")
+
+    from torch_geometric.data import HeteroData
+
+    device = torch.device("cuda:0")
+    data = HeteroData(sample_pyg_hetero_data).to(device)
+
+    in_channels_dict = {k: v.size(1) for k, v in data.x_dict.items()}
+    kwargs = dict(
+        node_types=data.node_types, edge_types=data.edge_types, heads=3, aggr="mean"
+    )
+    with pytest.raises(ValueError, match="static_graph"):
+        CuGraphHeteroGATConv(in_channels_dict, 2, use_cuda_graph=True, **kwargs)
+
+    conv1 = CuGraphHeteroGATConv(in_channels_dict, 2, **kwargs).to(device)
+    conv2 = CuGraphHeteroGATConv(
+        in_channels_dict, 2, static_graph=True, use_cuda_graph=True, **kwargs
+    ).to(device)
+    conv2.load_state_dict(conv1.state_dict())
+    conv1.eval()
+    conv2.eval()
+
+    edge_index_dict = data.edge_index_dict
+
+    with torch.no_grad():
+        cuda_graph = None
+        for _ in range(3):
+            # new feature values are replayed through the captured graph
+            x_dict = {k: torch.randn_like(v) for k, v in data.x_dict.items()}
+            out1 = conv1(x_dict, edge_index_dict)
+            out2 = conv2(x_dict, edge_index_dict)
+            for node_type in out1:
+                assert torch.allclose(out1[node_type], out2[node_type], atol=ATOL)
+
+            assert conv2._cuda_graph is not None
+            if cuda_graph is not None:
+                assert conv2._cuda_graph is cuda_graph
+            cuda_graph = conv2._cuda_graph
+
+        # a different autocast state is captured into a new graph, which is
+        # replayed in later autocast regions, i.e., after the casts cached by
+        # autocast in the region of the capture have been released
+        autocast_graph = None
+        garbage = []
+        for _ in range(2):
+            x_dict = {k: torch.randn_like(v) for k, v in data.x_dict.items()}
+            with torch.autocast(device.type, dtype=torch.float16):
+                out1 = conv1(x_dict, edge_index_dict)
+                out2 = conv2(x_dict, edge_index_dict)
+            for node_type in out1:
+                assert torch.allclose(out1[node_type], out2[node_type], atol=ATOL)
+
+            assert conv2._cuda_graph is not cuda_graph
+            if autocast_graph is not None:
+                assert conv2._cuda_graph is autocast_graph
+            autocast_graph = conv2._cuda_graph
+
+            # occupy the released memory with other values
+            garbage += [
+                torch.full(p.shape, float("nan"), dtype=torch.float16, device=device)
+                for p in conv2.parameters()
+            ]
+
+        out2 = conv2(x_dict, edge_index_dict)
+        out1 = conv1(x_dict, edge_index_dict)
+        for node_type in out1:
+            assert out2[node_type].dtype == torch.float32
+            assert torch.allclose(out1[node_type], out2[node_type], atol=ATOL)
+
+        # parameters assigned by loading are read by a newly captured graph,
+        # `assign` is available as of torch 2.1
+        for param in conv1.parameters():
+            param.normal_()
+        torch_version = tuple(map(int, torch.__version__.split(".")[:2]))
+        load_kwargs = {"assign": True} if torch_version >= (2, 1) else {}
+        conv2.load_state_dict(conv1.state_dict(), **load_kwargs)
+        assert conv2._cuda_graph is None
+
+        out1 = conv1(x_dict, edge_index_dict)
+        out2 = conv2(x_dict, edge_index_dict)
+        for node_type in out1:
+            assert torch.allclose(out1[node_type], out2[node_type], atol=ATOL)
+
+
+@pytest.mark.cugraph_ops
+@pytest.mark.skipif(isinstance(torch, MissingModule), reason="torch not available")
+@pytest.mark.skipif(
+    isinstance(torch_geometric, MissingModule), reason="torch_geometric not available"
+)
+def test_hetero_gat_conv_static_graph(sample_pyg_hetero_data):
+    major, minor, patch = torch_geometric.__version__.split(".")[:3]
+    pyg_version = tuple(map(int, [major, minor, patch]))
+    if pyg_version < (2, 4, 0):
+        pytest.skip("Skipping HeteroGATConv test")
+
+    from torch_geometric.data import HeteroData
+
+    device = torch.device("cuda:0")
+    data = HeteroData(sample_pyg_hetero_data).to(device)
+
+    in_channels_dict = {k: v.size(1) for k, v in data.x_dict.items()}
+    kwargs = dict(node_types=data.node_types, edge_types=data.edge_types, heads=3)
+    conv1 = CuGraphHeteroGATConv(in_channels_dict, 2, **kwargs).to(device)
+    conv2 = CuGraphHeteroGATConv(in_channels_dict, 2, static_graph=True, **kwargs).to(
+        device
+    )
+    conv2.load_state_dict(conv1.state_dict())
+
+    def cached_graphs():
+        return {k: v[3] for k, v in conv2._csc_cache.items()}
+
+    def check(x_dict, edge_index_dict):
+        out1 = conv1(x_dict, edge_index_dict)
+        out2 = conv2(x_dict, edge_index_dict)
+        for node_type in out1:
+            assert torch.allclose(out1[node_type], out2[node_type], atol=ATOL)
+
+    x_dict = data.x_dict
+    edge_index_dict = data.edge_index_dict
+    edge_type = ("v1", "e3", "v2")
+
+    check(x_dict, edge_index_dict)
+    graphs = cached_graphs()
+    assert graphs.keys() == set(data.edge_types)
+
+    # hit: same edge_index tensors and graph sizes
+    check(x_dict, edge_index_dict)
+    assert all(cached_graphs()[k] is v for k, v in graphs.items())
+
+    # miss: same indices, but a different edge_index tensor
+    edge_index_dict = dict(edge_index_dict)
+    edge_index_dict[edge_type] = edge_index_dict[edge_type].clone()
+    check(x_dict, edge_index_dict)
+    for k, v in cached_graphs().items():
+        assert (v is graphs[k]) == (k != edge_type)
+    graphs = cached_graphs()
+
+    # miss: new number of destination nodes
+    x_dict = dict(x_dict)
+    x_dict["v2"] = torch.cat([x_dict["v2"], x_dict["v2"][:1]])
+    check(x_dict, edge_index_dict)
+    for k, v in cached_graphs().items():
+        assert (v is graphs[k]) == ("v2" not in (k[0], k[2]))
+    graphs = cached_graphs()
+
+    # miss: explicit reset
+    conv2.reset_graph_cache()
+    assert len(conv2._csc_cache) == 0
+    check(x_dict, edge_index_dict)
+    assert all(cached_graphs()[k] is not v for k, v in graphs.items())
+
+    # miss: moving the module
+    conv2.to(device)
+    assert len(conv2._csc_cache) == 0
+    check(x_dict, edge_index_dict)
+
+
+@pytest.mark.cugraph_ops
+@pytest.mark.skipif(isinstance(torch, MissingModule), reason="torch not available")
+@pytest.mark.skipif(
+    isinstance(torch_geometric, MissingModule), reason="torch_geometric not available"
+)
+@pytest.mark.parametrize("per_edge_type", [False, True])
+def test_hetero_gat_conv_max_num_neighbors(sample_pyg_hetero_data, per_edge_type):
+    major, minor, patch = torch_geometric.__version__.split(".")[:3]
+    pyg_version = tuple(map(int, [major, minor, patch]))
+    if pyg_version < (2, 4, 0):
+        pytest.skip("Skipping HeteroGATConv test")
+
+    from torch_geometric.data import HeteroData
+
+    device = torch.device("cuda:0")
+    data = HeteroData(sample_pyg_hetero_data).to(device)
+
+    in_channels_dict = {k: v.size(1) for k, v in data.x_dict.items()}
+    kwargs = dict(node_types=data.node_types, edge_types=data.edge_types, heads=3)
+    conv = CuGraphHeteroGATConv(in_channels_dict, 2, **kwargs).to(device)
+
+    # the maximum in-degree of the destination nodes of every edge type
+    max_num_neighbors = {
+        edge_type: int(edge_index[1].bincount().max())
+        for edge_type, edge_index in data.edge_index_dict.items()
+    }
+    if not per_edge_type:
+        max_num_neighbors = max(max_num_neighbors.values())
+
+    out1 = conv(data.x_dict, data.edge_index_dict)
+    loss1 = sum(out1[node_type].mean() for node_type in out1)
+    grad1 = torch.autograd.grad(loss1, conv.attn_weights)[0]
+
+    out2 = conv(data.x_dict, data.edge_index_dict, max_num_neighbors)
+    loss2 = sum(out2[node_type].mean() for node_type in out2)
+    grad2 = torch.autograd.grad(loss2, conv.attn_weights)[0]
+
+    for node_type in out1:
+        assert torch.allclose(out1[node_type], out2[node_type], atol=ATOL)
+    assert torch.allclose(grad1, grad2, atol=ATOL)
+
+
+@pytest.mark.skipif(isinstance(torch, MissingModule), reason="torch not available")
+@pytest.mark.skipif(
+    isinstance(torch_geometric, MissingModule), reason="torch_geometric not available"
+)
+def test_hetero_gat_conv_batched_to_csc(sample_pyg_hetero_data):
+    num_nodes_dict = {}
+    edge_index_dict = {}
+    for key, value in sample_pyg_hetero_data.items():
+        if isinstance(key, tuple):
+            edge_index_dict[key] = value["edge_index"]
+        else:
+            num_nodes_dict[key] = value["x"].size(0)
+
+    # an edge type without edges in between
+    edge_index_dict = {
+        ("v2", "e0", "v1"): edge_index_dict.pop(("v2", "e0", "v1")),
+        ("v1", "e5", "v0"): torch.empty((2, 0), dtype=torch.long),
+        **edge_index_dict,
+    }
+    size_dict = {
+        edge_type: (num_nodes_dict[edge_type[0]], num_nodes_dict[edge_type[2]])
+        for edge_type in edge_index_dict
+    }
+
+    csc_dict = CuGraphHeteroGATConv._batched_to_csc(edge_index_dict, size_dict)
+    assert csc_dict.keys() == edge_index_dict.keys()
+
+    for edge_type, edge_index in edge_index_dict.items():
+        row1, colptr1, num_src_nodes1 = CuGraphHeteroGATConv.to_csc(
+            edge_index, size_dict[edge_type]
+        )
+        row2, colptr2, num_src_nodes2 = csc_dict[edge_type]
+
+        assert num_src_nodes1 == num_src_nodes2
+        assert torch.equal(colptr1, colptr2)
+        # the order of neighbors of a destination node is not specified
+        col = torch.repeat_interleave(colptr1.diff())
+        assert sorted(zip(row1.tolist(), col.tolist())) == sorted(
+            zip(row2.tolist(), col.tolist())
+        )